@@ -0,0 +1,28 @@
+#  -*- coding: utf-8 -*-
+'''
+Ahead-of-time build of the P9 Snakes on a Plane kernels
+
+Compiles the kernels in kernels.py into the snake_kernels extension module,
+so snake_simulation_modified.py can import them without waiting for Numba to
+compile them at start-up. Run once after installing or changing kernels.py:
+
+    python build_kernels.py
+'''
+
+import os
+from numba.pycc import CC
+import kernels
+
+cc = CC('snake_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__)) # build next to the script that imports it
+
+"""
+The exported signature has to match the arrays built by Grid exactly:
+occupied, neighbors, linex, liney, lengths, heads, tails, xpos, ypos,
+trapped, xmax, ymax, bc_int, nSteps, rand_buf, trajectory
+"""
+cc.export('simulate', 'i8(b1[:,::1], i4[:,:,::1], i2[:,::1], i2[:,::1], i2[::1], i2[::1], i2[::1], '
+                      'i2[::1], i2[::1], b1[::1], i8, i8, i8, i8, i1[::1], i2[:,:,:,::1])')(kernels.simulate.py_func)
+
+if __name__ == '__main__':
+    cc.compile()
@@ -0,0 +1,179 @@
+#  -*- coding: utf-8 -*-
+'''
+Compiled kernels for P9 Snakes on a Plane
+
+The simulation loop of snake_simulation_modified.py, compiled with Numba.
+The kernels are compiled just in time on import, or ahead of time into the
+snake_kernels extension module by build_kernels.py.
+'''
+
+import numpy as np
+from numba import njit # used to compile the kernels to machine code
+
+"""
+Lookup tables for picking a direction out of a 4-bit mask of allowed
+directions: POP[mask] is the number of set bits in mask and PICK[mask, k]
+is the index of the k-th set bit (-1 if there is none).
+"""
+POP = np.array([bin(mask).count('1') for mask in range(16)], dtype = np.int8)
+PICK = np.full((16, 4), -1, dtype = np.int8)
+for mask in range(16):
+    bits = [b for b in range(4) if mask >> b & 1]
+    PICK[mask, :len(bits)] = bits
+
+@njit(cache = True)
+def _step_snake(s, occupied, occ_flat, neighbors, linex, liney, lengths, heads, tails, xpos, ypos, trapped, xmax, ymax, bc_int, rand_buf, cursor):
+    """
+    Compiled function to advance snake s by one step: free its tail, move
+    its head to an open position on the grid and mark that position as
+    occupied. Doing all three in one pass keeps the sites around the snake
+    in cache between the writes and the neighbour lookups.
+    Parameters:
+        s: index of the snake to move
+        occupied: boolean array of occupied sites
+        occ_flat: flattened view of occupied
+        neighbors: indices into occ_flat of the neighbours of every site
+        linex, liney: ring buffers of the snake bodies, one row per snake
+        lengths: length of each snake
+        heads: index of the head of each snake in its ring buffer
+        tails: index of the tail of each snake in its ring buffer
+        xpos, ypos: current position of the head of each snake
+        trapped: whether each snake is trapped
+        xmax, ymax: size of the grid
+        bc_int: boundary condition code (0 = wall, 1 = periodic)
+        rand_buf: random integers in [0, 12) used to pick the direction
+        cursor: index of the next unused number in rand_buf
+
+    The state of snake s and occupied are updated in place. A snake that
+    is already trapped is skipped, so its body stays where it is and stays
+    marked as occupied. Returns the updated cursor; a number is only used
+    up when there is a choice between directions.
+    """
+    if trapped[s]:
+        return cursor
+    x = xpos[s]
+    y = ypos[s]
+
+    # set the previously occupied space (tail of the ring buffer) by the snake to be moveable
+    tail = tails[s]
+    occupied[linex[s, tail], liney[s, tail]] = False
+
+    """
+    Determine which directions are disallowed because the site has already
+    been occupied, as a bit mask with one bit per direction
+    (bit 0 = north, 1 = east, 2 = south, 3 = west). The neighbour table
+    already accounts for the walls or the wrap-around of the grid.
+    """
+    neighbors_xy = neighbors[x, y]
+    disallowed = 0
+    if occ_flat[neighbors_xy[0]]:
+        disallowed |= 1
+    if occ_flat[neighbors_xy[1]]:
+        disallowed |= 2
+    if occ_flat[neighbors_xy[2]]:
+        disallowed |= 4
+    if occ_flat[neighbors_xy[3]]:
+        disallowed |= 8
+
+    allowed = ~disallowed & 0xF
+    if POP[allowed] == 0:
+        trapped[s] = True #snake is trapped!
+        occupied[linex[s, tail], liney[s, tail]] = True # it stays put, so its tail is still there
+        return cursor
+
+    if POP[allowed] == 1:
+        # only one way to go, so no random number is needed
+        direction = PICK[allowed, 0]
+    else:
+        # randomly pick one of the allowed directions; 12 is divisible by 2, 3 and 4 so every choice is equally likely
+        direction = PICK[allowed, rand_buf[cursor] % POP[allowed]]
+        cursor += 1
+
+    if direction == 0:
+        y += 1
+    elif direction == 1:
+        x += 1
+    elif direction == 2:
+        y -= 1
+    else:
+        x -= 1
+
+    """
+    With periodic boundary conditions, it's possible that (xpos, ypos) could
+    be off the grid (e.g., xpos < 0 or xpos >= xmax). Since a snake only
+    moves one site at a time, it can only be off by one site, so adding or
+    subtracting the size of the grid once brings it back onto the opposite
+    side. For example, suppose xmax = 20; then if xpos = 20, 20 - 20 = 0; if
+    xpos = -1, -1 + 20 = 19. This avoids the (much slower) modulo operator.
+    """
+    if bc_int == 1:
+        if x < 0:
+            x += xmax
+        elif x >= xmax:
+            x -= xmax
+        if y < 0:
+            y += ymax
+        elif y >= ymax:
+            y -= ymax
+
+    # advance the body of the snake by overwriting the tail slot of the ring buffer with the new head
+    linex[s, tail] = x
+    liney[s, tail] = y
+    heads[s] = tail
+    tails[s] = tail - 1 if tail > 0 else lengths[s] - 1
+    xpos[s] = x
+    ypos[s] = y
+    occupied[x, y] = True # mark the new head; the rest of the body is still marked from earlier steps
+    return cursor
+
+@njit(cache = True)
+def simulate(occupied, neighbors, linex, liney, lengths, heads, tails, xpos, ypos, trapped,
+             xmax, ymax, bc_int, nSteps, rand_buf, trajectory):
+    """
+    Compiled kernel to run the whole simulation without returning to Python.
+    Parameters:
+        occupied: boolean array of occupied sites
+        neighbors: indices into the flattened occupied array of the
+            neighbours of every site
+        linex, liney: ring buffers of the snake bodies, one row per snake
+        lengths: length of each snake
+        heads: index of the head of each snake in its ring buffer
+        tails: index of the tail of each snake in its ring buffer
+        xpos, ypos: current position of the head of each snake
+        trapped: whether each snake is trapped
+        xmax, ymax: size of the grid
+        bc_int: boundary condition code (0 = wall, 1 = periodic)
+        nSteps: number of steps the snakes will slither
+        rand_buf: random integers in [0, 12), at least one per snake per step
+        trajectory: (nSteps, nSnakes, max length, 2) array that receives the
+            x and y coordinates of the bodies of the snakes in head-to-tail
+            order after each step
+
+    The state arrays are updated in place. The simulation stops as soon as
+    every snake is trapped; the number of steps taken is returned.
+    """
+    nSnakes = len(lengths)
+    occ_flat = occupied.reshape(-1) # a view, so writes to occupied are seen through it
+    cursor = 0 # next unused number in rand_buf
+    for step in range(nSteps): # iterate for a set number of steps
+        for s in range(nSnakes):
+            cursor = _step_snake(s, occupied, occ_flat, neighbors, linex, liney, lengths, heads, tails, xpos, ypos,
+                                 trapped, xmax, ymax, bc_int, rand_buf, cursor) # moves the snakes
+
+            # record the body in head-to-tail order for the animation
+            length = lengths[s]
+            head = heads[s]
+            for k in range(length):
+                trajectory[step, s, k, 0] = linex[s, (head + k) % length]
+                trajectory[step, s, k, 1] = liney[s, (head + k) % length]
+
+        if trapped.all():
+            return step + 1
+    return nSteps
+
+# compile the kernels once at import so the first run of the simulation does not pay for it
+simulate(np.zeros((2, 2), dtype = bool), np.zeros((2, 2, 4), dtype = np.int32),
+         np.zeros((1, 1), dtype = np.int16), np.zeros((1, 1), dtype = np.int16), np.ones(1, dtype = np.int16),
+         np.zeros(1, dtype = np.int16), np.zeros(1, dtype = np.int16), np.zeros(1, dtype = np.int16),
+         np.zeros(1, dtype = np.int16), np.zeros(1, dtype = bool), 1, 1, 0, 1, np.zeros(1, dtype = np.int8),
+         np.zeros((1, 1, 1, 2), dtype = np.int16))
@@ -14,6 +14,8 @@ Due: 2019-04-17
 # %% codecell
 
 import random
+import time
+from collections import deque
 import numpy as np
 import matplotlib # used to create interactive plots in the Hydrogen package of the Atom IDE
 matplotlib.use('Qt5Agg') # used to create interactive plots in the Hydrogen package of the Atom IDE
@@ -39,17 +41,21 @@ class Snake:
 
         # Set the initial location and orientation of the snakes as defined by the user
         if orientation == 'north':
-            self.linexpos = [position[0]] * (length)
-            self.lineypos = np.arange(position[1], position[1] - length, -1)
+            linexpos = [position[0]] * (length)
+            lineypos = np.arange(position[1], position[1] - length, -1)
         elif orientation == 'south':
-            self.linexpos = [position[0]] * (length)
-            self.lineypos = np.arange(position[1], position[1] + length, 1)
+            linexpos = [position[0]] * (length)
+            lineypos = np.arange(position[1], position[1] + length, 1)
         elif orientation == 'east':
-            self.linexpos = np.arange(position[0], position[0] - length, -1)
-            self.lineypos = [position[1]] * (length)
+            linexpos = np.arange(position[0], position[0] - length, -1)
+            lineypos = [position[1]] * (length)
         elif orientation == 'west':
-            self.linexpos = np.arange(position[0], position[0] + length, 1)
-            self.lineypos = [position[1]] * (length)
+            linexpos = np.arange(position[0], position[0] + length, 1)
+            lineypos = [position[1]] * (length)
+
+        # store the body in bounded deques so that advancing the snake drops the tail automatically
+        self.linexpos = deque(linexpos, maxlen = length)
+        self.lineypos = deque(lineypos, maxlen = length)
 
         self.symbol = symbol
         self.color = color
@@ -72,28 +78,31 @@ class Snake:
         for the next move are disallowed because the site has already been
         occupied.
         """
+        # bind the attributes used below to locals once instead of looking them up on every use
+        xp, yp, lx, ly = self.xpos, self.ypos, self.linexpos, self.lineypos
+
         disallowed = set() #empty set object; will add disallowed directions
         if bc == 'wall':
-            if self.ypos == ymax or occupied[self.xpos, self.ypos+1]:
+            if yp == ymax or occupied[xp, yp+1]:
                 disallowed.add('north')
-            if self.xpos == xmax or occupied[self.xpos+1, self.ypos]:
+            if xp == xmax or occupied[xp+1, yp]:
                 disallowed.add('east')
-            if self.ypos == 0 or occupied[self.xpos, self.ypos-1]:
+            if yp == 0 or occupied[xp, yp-1]:
                 disallowed.add('south')
-            if self.xpos == 0 or occupied[self.xpos-1, self.ypos]:
+            if xp == 0 or occupied[xp-1, yp]:
                 disallowed.add('west')
         elif bc == 'periodic':
-            if (self.ypos == ymax and occupied[self.xpos, (self.ypos+1) % ymax]) \
-            or (self.ypos < ymax and occupied[self.xpos, self.ypos+1]):
+            if (yp == ymax and occupied[xp, (yp+1) % ymax]) \
+            or (yp < ymax and occupied[xp, yp+1]):
                 disallowed.add('north')
-            if (self.xpos == xmax and occupied[(self.xpos+1) % xmax, self.ypos]) \
-            or (self.xpos < xmax and occupied[self.xpos+1, self.ypos]):
+            if (xp == xmax and occupied[(xp+1) % xmax, yp]) \
+            or (xp < xmax and occupied[xp+1, yp]):
                 disallowed.add('east')
-            if (self.ypos == 0 and occupied[self.xpos, (self.ypos-1) % ymax]) \
-            or (self.ypos > 0 and occupied[self.xpos, self.ypos-1]):
+            if (yp == 0 and occupied[xp, (yp-1) % ymax]) \
+            or (yp > 0 and occupied[xp, yp-1]):
                 disallowed.add('south')
-            if (self.xpos == 0 and occupied[(self.xpos-1) % xmax, self.ypos]) \
-            or (self.xpos > 0 and occupied[self.xpos-1, self.ypos]):
+            if (xp == 0 and occupied[(xp-1) % xmax, yp]) \
+            or (xp > 0 and occupied[xp-1, yp]):
                 disallowed.add('west')
 
         # Use the set method 'difference' to get set of allowed directions
@@ -107,45 +116,47 @@ class Snake:
             object to a list because random.choice doesn't work on sets
             """
 
-            self.direction = random.choice(list(allowed))
-            if self.direction == 'north':
-                if (bc == 'wall' and self.ypos < ymax) or bc == 'periodic':
-                    self.ypos += 1
+            self.direction = direction = random.choice(list(allowed))
+            if direction == 'north':
+                if (bc == 'wall' and yp < ymax) or bc == 'periodic':
+                    yp += 1
                     # self.lineypos = [x + 1 for x in self.lineypos]
-            elif self.direction == 'east':
-                if (bc == 'wall' and self.xpos < xmax) or bc == 'periodic':
-                    self.xpos += 1
+            elif direction == 'east':
+                if (bc == 'wall' and xp < xmax) or bc == 'periodic':
+                    xp += 1
                     # self.linexpos = [x + 1 for x in self.linexpos]
-            elif self.direction == 'south':
-                if (bc == 'wall' and self.ypos > 0) or bc == 'periodic':
-                    self.ypos -= 1
+            elif direction == 'south':
+                if (bc == 'wall' and yp > 0) or bc == 'periodic':
+                    yp -= 1
                     # self.lineypos = [x - 1 for x in self.lineypos]
-            elif self.direction == 'west':
-                if (bc == 'wall' and self.xpos > 0) or bc == 'periodic':
-                    self.xpos -= 1
+            elif direction == 'west':
+                if (bc == 'wall' and xp > 0) or bc == 'periodic':
+                    xp -= 1
                     # self.linexpos = [x - 1 for x in self.linexpos]
 
-            # advance the body of the snake to the previous coordinates of the head by appending those coordinates and subsequently removing the end term
-            self.linexpos = np.append(self.xpos, self.linexpos)
-            self.lineypos = np.append(self.ypos, self.lineypos)
-            self.linexpos = np.delete(self.linexpos, -1)
-            self.lineypos = np.delete(self.lineypos, -1)
-
             """
             With periodic boundary conditions, it's possible that (xpos, ypos) could
-            be off the grid (e.g., xpos < 0 or xpos > xmax). The Python modulo
-            operator can be used to give exactly what we need for periodic bc. For
-            example, suppose xmax = 20; then if xpos = 21, 21 % 20 = 1; if xpos = -1,
-            -1 % 20 = 19. (Modulo result on a negative first argument may seem
-            strange, but it's intended for exactly this type of application. Cool!)
-            If 0 <= xpos < xmax, then modulo simply returns xpos. For example,
-            0 % 20 = 0, 14 % 20 = 14, etc. Only special case is when xpos = xmax, in
-            which case we want to keep xpos = xmax and not xpos % xmax = 0
+            be off the grid (e.g., xpos < 0 or xpos > xmax). Since a snake only
+            moves one site at a time, it can only be off by one site, so adding or
+            subtracting xmax once brings it back onto the grid. For example,
+            suppose xmax = 20; then if xpos = 21, 21 - 20 = 1; if xpos = -1,
+            -1 + 20 = 19. If 0 <= xpos <= xmax, xpos is left alone; in
+            particular xpos = xmax is kept as xmax and not wrapped to 0
             """
-            if self.xpos != xmax:
-                self.xpos = self.xpos % xmax
-            if self.ypos != ymax:
-                self.ypos = self.ypos % ymax
+            if bc == 'periodic':
+                if xp < 0:
+                    xp += xmax
+                elif xp > xmax:
+                    xp -= xmax
+                if yp < 0:
+                    yp += ymax
+                elif yp > ymax:
+                    yp -= ymax
+
+            # advance the body of the snake to the new coordinates of the head; the deques drop the end term themselves
+            lx.appendleft(xp)
+            ly.appendleft(yp)
+            self.xpos, self.ypos = xp, yp # the deques were updated in place and need no writing back
 
 #=============================================================================
 class Grid:
@@ -171,12 +182,13 @@ class Grid:
         #array to keep track of points that are occupied
         self.occupied = np.zeros([self.xmax + 1, self.ymax + 1], dtype = bool)
 
-        plt.figure() #create new figure window if one is already open
-        ax = plt.axes(xlim = (0, self.xmax), ylim = (0, self.ymax))
+        self.fig = plt.figure() #create new figure window if one is already open
+        self.ax = plt.axes(xlim = (0, self.xmax), ylim = (0, self.ymax))
 
         for w in self.snakes: # plot the snake heads and snake bodies
-            p, = ax.plot([w.xpos], [w.ypos], w.symbol)
-            l, = ax.plot(w.linexpos, w.lineypos)
+            # animated artists are left out of full redraws and drawn by go() on top of the saved background
+            p, = self.ax.plot([w.xpos], [w.ypos], w.symbol, animated = True)
+            l, = self.ax.plot(w.linexpos, w.lineypos, animated = True)
             self.occupied[w.xpos, w.ypos] = True
             self.occupied[w.linexpos,w.lineypos] = True
             self.point.append(p)
@@ -184,6 +196,18 @@ class Grid:
 
         plt.title('Snakes on a Plane nStep = {}'.format(nSteps))
 
+        # save the static parts of the plot every time the whole figure is drawn
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+        plt.show(block = False)
+        self.fig.canvas.draw()
+
+    def on_draw(self, event):
+        """
+        Function to save the background of the axes after a full redraw of
+        the figure (e.g. when the window is first shown or resized)
+        """
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+
     def go(self):
         """
         Function to advance the main program
@@ -195,7 +219,7 @@ class Grid:
                     w.move(self.xmax, self.ymax, self.bc, self.occupied) # moves the snakes
                     if not w.trapped: # if not trapped, set the following conditions
                         self.point[i].set_data(w.xpos, w.ypos)
-                        self.lines[i].set_data(w.linexpos, w.lineypos)
+                        self.lines[i].set_data(list(w.linexpos), list(w.lineypos))
                         self.occupied[w.xpos, w.ypos] = True
                         self.occupied[w.linexpos,w.lineypos] = True
                         """
@@ -216,7 +240,14 @@ class Grid:
                                 self.occupied[w.xpos, self.ymax] = True
 
 
-                plt.pause(0.2)
+                # blit the snakes onto the saved background instead of redrawing the whole figure
+                self.fig.canvas.restore_region(self.background)
+                for p, l in zip(self.point, self.lines):
+                    self.ax.draw_artist(p)
+                    self.ax.draw_artist(l)
+                self.fig.canvas.blit(self.ax.bbox)
+                self.fig.canvas.flush_events()
+                time.sleep(0.02)
             break
 # Main program =================================================================
 snec = Snake(position = (5, 5), symbol = 'bo', color = 'b', orientation = 'north', length = 12)
@@ -13,139 +13,64 @@ Due: 2019-04-17
 
 # %% codecell
 
-import random
+from dataclasses import dataclass
 import numpy as np
 import matplotlib # used to create interactive plots in the Hydrogen package of the Atom IDE
 matplotlib.use('Qt5Agg') # used to create interactive plots in the Hydrogen package of the Atom IDE
 import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
 
 #=============================================================================
+# boundary conditions are passed to the compiled kernels as integers
+BC_CODES = {'wall': 0, 'periodic': 1}
+
+try:
+    # ahead-of-time compiled kernels, built by running build_kernels.py
+    from snake_kernels import simulate
+except ImportError:
+    # fall back to compiling the kernels just in time
+    from kernels import simulate
+
+#=============================================================================
+@dataclass
 class Snake:
     """
-    This is a class for to define a snake.
+    This is a class to define the starting configuration of a snake. The
+    state of the snakes during the simulation is held by the Grid.
+    Parameters:
+        position: starting position of the snake
+        symbol: symbol for the snake head
+        color: color of the snake
+        orientation: initial travel direction of the snake
+        length: length of the snake
     """
-    def __init__(self, position = (10, 10), symbol = 'bo', color = 'b', orientation = 'north', length = 5):
-        """
-        The constructor for Snake class.
-        Parameters:
-            position: starting position of the snake
-            symbol: symbol for the snake head
-            color: color of the snake
-            orientation: initial travel direction of the snake
-            length: length of the snake
-        """
-        self.xpos = position[0]
-        self.ypos = position[1]
+    position: tuple = (10, 10)
+    symbol: str = 'bo'
+    color: str = 'b'
+    orientation: str = 'north'
+    length: int = 5
 
-        # Set the initial location and orientation of the snakes as defined by the user
-        if orientation == 'north':
-            self.linexpos = [position[0]] * (length)
-            self.lineypos = np.arange(position[1], position[1] - length, -1)
-        elif orientation == 'south':
-            self.linexpos = [position[0]] * (length)
-            self.lineypos = np.arange(position[1], position[1] + length, 1)
-        elif orientation == 'east':
-            self.linexpos = np.arange(position[0], position[0] - length, -1)
-            self.lineypos = [position[1]] * (length)
-        elif orientation == 'west':
-            self.linexpos = np.arange(position[0], position[0] + length, 1)
-            self.lineypos = [position[1]] * (length)
-
-        self.symbol = symbol
-        self.color = color
-        self.orientation = orientation
-        self.length = length
-        self.direction = None
-        self.trapped = False
-
-    def move(self, xmax, ymax, bc, occupied):
+    def body(self):
         """
-        Function to move the snakes to an open position on the grid.
-        Parameters:
-            xmax
-            ymax
-            bc
-            occupied
-
-        For each boundary condition option ('wall' or 'periodic'), given a
-        snake currently at position (xpos, ypos), determine which directions
-        for the next move are disallowed because the site has already been
-        occupied.
+        Function to lay out the initial body of the snake.
+        Returns the x and y coordinates of the body, from head to tail.
         """
-        disallowed = set() #empty set object; will add disallowed directions
-        if bc == 'wall':
-            if self.ypos == ymax or occupied[self.xpos, self.ypos+1]:
-                disallowed.add('north')
-            if self.xpos == xmax or occupied[self.xpos+1, self.ypos]:
-                disallowed.add('east')
-            if self.ypos == 0 or occupied[self.xpos, self.ypos-1]:
-                disallowed.add('south')
-            if self.xpos == 0 or occupied[self.xpos-1, self.ypos]:
-                disallowed.add('west')
-        elif bc == 'periodic':
-            if (self.ypos == ymax and occupied[self.xpos, (self.ypos+1) % ymax]) \
-            or (self.ypos < ymax and occupied[self.xpos, self.ypos+1]):
-                disallowed.add('north')
-            if (self.xpos == xmax and occupied[(self.xpos+1) % xmax, self.ypos]) \
-            or (self.xpos < xmax and occupied[self.xpos+1, self.ypos]):
-                disallowed.add('east')
-            if (self.ypos == 0 and occupied[self.xpos, (self.ypos-1) % ymax]) \
-            or (self.ypos > 0 and occupied[self.xpos, self.ypos-1]):
-                disallowed.add('south')
-            if (self.xpos == 0 and occupied[(self.xpos-1) % xmax, self.ypos]) \
-            or (self.xpos > 0 and occupied[self.xpos-1, self.ypos]):
-                disallowed.add('west')
-
-        # Use the set method 'difference' to get set of allowed directions
-        allowed = {'north', 'east', 'south', 'west'}.difference(disallowed)
-
-        if len(allowed) == 0:
-            self.trapped = True #snake is trapped!
-        else:
-            """
-            Randomly pick from the allowed directions; need to convert set
-            object to a list because random.choice doesn't work on sets
-            """
-
-            self.direction = random.choice(list(allowed))
-            if self.direction == 'north':
-                if (bc == 'wall' and self.ypos < ymax) or bc == 'periodic':
-                    self.ypos += 1
-                    # self.lineypos = [x + 1 for x in self.lineypos]
-            elif self.direction == 'east':
-                if (bc == 'wall' and self.xpos < xmax) or bc == 'periodic':
-                    self.xpos += 1
-                    # self.linexpos = [x + 1 for x in self.linexpos]
-            elif self.direction == 'south':
-                if (bc == 'wall' and self.ypos > 0) or bc == 'periodic':
-                    self.ypos -= 1
-                    # self.lineypos = [x - 1 for x in self.lineypos]
-            elif self.direction == 'west':
-                if (bc == 'wall' and self.xpos > 0) or bc == 'periodic':
-                    self.xpos -= 1
-                    # self.linexpos = [x - 1 for x in self.linexpos]
-
-            # advance the body of the snake to the previous coordinates of the head by appending those coordinates and subsequently removing the end term
-            self.linexpos = np.append(self.xpos, self.linexpos)
-            self.lineypos = np.append(self.ypos, self.lineypos)
-            self.linexpos = np.delete(self.linexpos, -1)
-            self.lineypos = np.delete(self.lineypos, -1)
+        position, length = self.position, self.length
 
-            """
-            With periodic boundary conditions, it's possible that (xpos, ypos) could
-            be off the grid (e.g., xpos < 0 or xpos > xmax). The Python modulo
-            operator can be used to give exactly what we need for periodic bc. For
-            example, suppose xmax = 20; then if xpos = 21, 21 % 20 = 1; if xpos = -1,
-            -1 % 20 = 19. (Modulo result on a negative first argument may seem
-            strange, but it's intended for exactly this type of application. Cool!)
-            If 0 <= xpos < xmax, then modulo simply returns xpos. For example,
-            0 % 20 = 0, 14 % 20 = 14, etc. Only special case is when xpos = xmax, in
-            which case we want to keep xpos = xmax and not xpos % xmax = 0
-            """
-            if self.xpos != xmax:
-                self.xpos = self.xpos % xmax
-            if self.ypos != ymax:
-                self.ypos = self.ypos % ymax
+        # Set the initial location and orientation of the snakes as defined by the user
+        if self.orientation == 'north':
+            linexpos = [position[0]] * (length)
+            lineypos = np.arange(position[1], position[1] - length, -1)
+        elif self.orientation == 'south':
+            linexpos = [position[0]] * (length)
+            lineypos = np.arange(position[1], position[1] + length, 1)
+        elif self.orientation == 'east':
+            linexpos = np.arange(position[0], position[0] - length, -1)
+            lineypos = [position[1]] * (length)
+        elif self.orientation == 'west':
+            linexpos = np.arange(position[0], position[0] + length, 1)
+            lineypos = [position[1]] * (length)
+        return linexpos, lineypos
 
 #=============================================================================
 class Grid:
@@ -161,7 +86,6 @@ class Grid:
             bc: periodic or wall
             nSteps: number of steps the snakes will slither
         """
-        self.snakes = snakes
         self.xmax = gridsize[0]
         self.ymax = gridsize[1]
         self.bc = bc
@@ -169,55 +93,130 @@ class Grid:
         self.point = []
         self.lines = []
         #array to keep track of points that are occupied
-        self.occupied = np.zeros([self.xmax + 1, self.ymax + 1], dtype = bool)
+        if self.bc == 'wall':
+            """
+            With wall boundary conditions, the array is padded with a border
+            of sites that are always occupied, so a move into a wall is
+            rejected by the same lookup as a move into a snake. Positions are
+            stored shifted by self.offset to make room for the border.
+            """
+            self.offset = 1
+            self.occupied = np.zeros([self.xmax + 3, self.ymax + 3], dtype = bool)
+            self.occupied[0, :] = self.occupied[-1, :] = self.occupied[:, 0] = self.occupied[:, -1] = True
+        else:
+            """
+            With periodic boundary conditions, a position on a wall is
+            identical to the corresponding position on the opposite wall, so
+            the grid only has xmax by ymax distinct sites and positions are
+            taken modulo the grid size.
+            """
+            self.offset = 0
+            self.occupied = np.zeros([self.xmax, self.ymax], dtype = bool)
 
-        plt.figure() #create new figure window if one is already open
+        """
+        For every site, the indices of its north, east, south and west
+        neighbours in the flattened occupied array. Sites on the border of
+        the wall grid are never occupied by a snake head, so clipping their
+        neighbours is harmless; on the periodic grid the neighbours wrap
+        around.
+        """
+        nx, ny = self.occupied.shape
+        x, y = np.meshgrid(np.arange(nx), np.arange(ny), indexing = 'ij')
+        mode = 'clip' if self.bc == 'wall' else 'wrap'
+        self.neighbors = np.stack([np.ravel_multi_index((x, y + 1), (nx, ny), mode = mode),
+                                   np.ravel_multi_index((x + 1, y), (nx, ny), mode = mode),
+                                   np.ravel_multi_index((x, y - 1), (nx, ny), mode = mode),
+                                   np.ravel_multi_index((x - 1, y), (nx, ny), mode = mode)], axis = -1).astype(np.int32)
+
+        """
+        The state of the snakes is stored as one array per quantity, indexed
+        by snake. Coordinates and ring buffer indices are kept as int16 to
+        keep the state small, which limits the grid to 32767 sites a side.
+        Each body is a ring buffer (padded to the longest snake): the head
+        sits at index heads[s] and the body follows at increasing (wrapped)
+        indices up to the tail at index tails[s], the slot just before the
+        head. Moving a snake overwrites the tail slot with the new head
+        instead of reallocating the whole body.
+        """
+        pad = 2 if self.bc == 'wall' else 0 # the wall border adds a site on either side
+        if max(self.xmax, self.ymax) + pad > np.iinfo(np.int16).max:
+            raise ValueError('gridsize {} is too large for int16 coordinates'.format(gridsize))
+        nSnakes = len(snakes)
+        self.lengths = np.array([w.length for w in snakes], dtype = np.int16)
+        self.linex = np.zeros((nSnakes, self.lengths.max()), dtype = np.int16)
+        self.liney = np.zeros_like(self.linex)
+        for s, w in enumerate(snakes):
+            self.linex[s, :w.length], self.liney[s, :w.length] = w.body()
+        self.heads = np.zeros(nSnakes, dtype = np.int16)
+        self.tails = self.lengths - 1
+        self.xpos = np.array([w.position[0] for w in snakes], dtype = np.int16)
+        self.ypos = np.array([w.position[1] for w in snakes], dtype = np.int16)
+        if self.bc == 'wall':
+            self.linex += self.offset
+            self.liney += self.offset
+            self.xpos += self.offset
+            self.ypos += self.offset
+        else:
+            self.linex %= self.xmax
+            self.liney %= self.ymax
+            self.xpos %= self.xmax
+            self.ypos %= self.ymax
+        self.trapped = np.zeros(nSnakes, dtype = bool)
+        # bodies of the snakes after every step, filled in by simulate_only() and played back by animate()
+        self.trajectory = np.empty((self.nSteps, nSnakes, self.lengths.max(), 2), dtype = np.int16)
+        # random number generator for the moves; simulate_only() draws a fresh batch from it on every call
+        self.rng = np.random.default_rng()
+
+        self.fig = plt.figure() #create new figure window if one is already open
         ax = plt.axes(xlim = (0, self.xmax), ylim = (0, self.ymax))
 
-        for w in self.snakes: # plot the snake heads and snake bodies
-            p, = ax.plot([w.xpos], [w.ypos], w.symbol)
-            l, = ax.plot(w.linexpos, w.lineypos)
-            self.occupied[w.xpos, w.ypos] = True
-            self.occupied[w.linexpos,w.lineypos] = True
+        for s, w in enumerate(snakes): # plot the snake heads and snake bodies
+            length = self.lengths[s]
+            p, = ax.plot(self.xpos[s:s+1] - self.offset, self.ypos[s:s+1] - self.offset, w.symbol)
+            l, = ax.plot(self.linex[s, :length] - self.offset, self.liney[s, :length] - self.offset)
+            self.occupied[self.xpos[s], self.ypos[s]] = True
+            self.occupied[self.linex[s, :length], self.liney[s, :length]] = True
             self.point.append(p)
             self.lines.append(l)
 
         plt.title('Snakes on a Plane nStep = {}'.format(nSteps))
 
+    def simulate_only(self):
+        """
+        Function to run the simulation with the compiled simulate kernel.
+        Returns the trajectory of the snakes: an (nStepsTaken, nSnakes,
+        max length, 2) array holding the x and y coordinates of the body of
+        each snake, from head to tail, after every step.
+        """
+        # random numbers for the moves, drawn in one go rather than one call per snake per step (enough for every move to need one)
+        self.rand_buf = self.rng.integers(0, 12, size = self.nSteps * len(self.lengths), dtype = np.int8)
+        self.nStepsTaken = simulate(self.occupied, self.neighbors, self.linex, self.liney, self.lengths, self.heads, self.tails,
+                                    self.xpos, self.ypos, self.trapped, self.xmax, self.ymax,
+                                    BC_CODES[self.bc], self.nSteps, self.rand_buf, self.trajectory)
+        # shift the recorded positions back to grid coordinates
+        return self.trajectory[:self.nStepsTaken] - self.offset
+
+    def animate(self, trajectory):
+        """
+        Function to play back a trajectory returned by simulate_only. Only
+        the snakes are redrawn for each frame (blitting); the rest of the
+        figure is drawn once.
+        """
+        def update(step):
+            for s, length in enumerate(self.lengths):
+                self.point[s].set_data(trajectory[step, s, :1, 0], trajectory[step, s, :1, 1])
+                self.lines[s].set_data(trajectory[step, s, :length, 0], trajectory[step, s, :length, 1])
+            return self.point + self.lines
+
+        self.anim = FuncAnimation(self.fig, update, frames = len(trajectory), interval = 50, blit = True, repeat = False)
+        plt.show()
+
     def go(self):
         """
-        Function to advance the main program
+        Function to advance the main program: run the whole simulation
+        first, then animate the result.
         """
-        while not all([w.trapped for w in self.snakes]):
-            for j in range(self.nSteps): # iterate for a set number of steps
-                for i, w in enumerate(self.snakes):
-                    self.occupied[w.linexpos[-1],w.lineypos[-1]] = False # set the previously occupied space by the snakes to be moveable
-                    w.move(self.xmax, self.ymax, self.bc, self.occupied) # moves the snakes
-                    if not w.trapped: # if not trapped, set the following conditions
-                        self.point[i].set_data(w.xpos, w.ypos)
-                        self.lines[i].set_data(w.linexpos, w.lineypos)
-                        self.occupied[w.xpos, w.ypos] = True
-                        self.occupied[w.linexpos,w.lineypos] = True
-                        """
-                        When using periodic boundary conditions, a position on a
-                        wall is identical to the corresponding position on the
-                        opposite wall. So if a snake visits (x, ymax) then
-                        (x, 0) must also be marked as occupied; if a snake vists
-                        (0, y) then (xmax, y) must also be marked as occupied; etc.
-                        """
-                        if self.bc == 'periodic':
-                            if w.xpos == self.xmax:
-                                self.occupied[0, w.ypos] = True
-                            elif w.xpos == 0:
-                                self.occupied[self.xmax, w.ypos] = True
-                            if w.ypos == self.ymax:
-                                self.occupied[w.xpos, 0] = True
-                            elif w.ypos == 0:
-                                self.occupied[w.xpos, self.ymax] = True
-
-
-                plt.pause(0.2)
-            break
+        self.animate(self.simulate_only())
 #main program=================================================================
 snec = Snake(position = (5, 5), symbol = 'bo', color = 'b', orientation = 'north', length = 5)
 snek = Snake(position = (15, 15), symbol = 'ro', color = 'r', orientation = 'south', length = 5)